@@ -0,0 +1,254 @@
+import os
+import json
+import re
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+import httpx
+from fastapi import HTTPException, Header
+from openai import AsyncOpenAI
+
+# -------------------------------
+# Environment Variables
+# -------------------------------
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+API_KEY = os.getenv("API_KEY")
+
+if not OPENAI_API_KEY:
+    raise ValueError("OPENAI_API_KEY is missing")
+if not API_KEY:
+    raise ValueError("API_KEY is missing")
+
+# One shared HTTP/2 pool for all OpenAI calls: concurrent requests
+# multiplex over a single TLS session instead of queueing on the SDK's
+# default connection limits.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+    timeout=httpx.Timeout(15.0, connect=3.0),
+)
+aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+# -------------------------------
+# Authentication
+# -------------------------------
+def verify_api_key(x_api_key: str = Header(...)):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+# -------------------------------
+# Prompts
+# -------------------------------
+# Static instructions live in the system message so OpenAI's prefix cache
+# can reuse them across requests; only the scammer message is volatile.
+DETECTION_SYSTEM = """
+You are an advanced AI Honeypot designed to detect scammers and safely engage them to extract intelligence.
+
+GOALS:
+1. Detect if the sender is likely a scammer.
+2. If scam is detected → respond like a believable human victim.
+3. Try to extract more scam details such as:
+   - Payment requests
+   - UPI IDs
+   - Bank account details
+   - External phishing links
+   - Phone numbers
+4. Keep the scammer engaged without revealing suspicion.
+5. If message is NOT scam → reply politely and normally.
+
+SCAM INDICATORS TO WATCH FOR:
+- Urgency or threats (account blocked, immediate action required)
+- Payment demands
+- Requests for OTP / PIN / passwords
+- Fake bank or government impersonation
+- Suspicious links
+- Requests for verification
+
+RESPONSE STYLE:
+- Sound natural and slightly confused
+- Ask questions that encourage scammer to reveal details
+- Do NOT accuse scammer
+- Keep reply short and human-like
+
+Respond ONLY in valid JSON using this format:
+
+{
+  "scam_detected": true/false,
+  "agent_reply": "human style reply continuing conversation",
+  "confidence_score": number between 0 and 1
+}
+
+IMPORTANT: Always return valid JSON with all fields filled. If nothing is detected, fill 'agent_reply' with 'No scam detected'.
+"""
+
+NO_SCAM_VERDICT = {
+    "scam_detected": False,
+    "agent_reply": "No scam detected",
+    "confidence_score": 0.0
+}
+
+# -------------------------------
+# Detection Call + Micro-Batching
+# -------------------------------
+def format_history(history) -> str:
+    """Serialize the last turns as compact 'sender: text' lines.
+
+    Capped at 6 turns so the variable prompt tail stays short and the
+    cached system prefix stays effective; repr() of raw entries would
+    waste prompt tokens on field names and quoting.
+    """
+    lines = []
+    for entry in history[-6:]:
+        if isinstance(entry, dict):
+            sender = entry.get("sender", "unknown")
+            text = entry.get("text", "")
+        else:
+            sender = getattr(entry, "sender", "unknown")
+            text = getattr(entry, "text", "")
+        lines.append(f"{sender}: {text}")
+    return "\n".join(lines)
+
+async def _classify(message: str) -> dict:
+    response = await aclient.chat.completions.create(
+        model="gpt-5-mini",
+        messages=[
+            {"role": "system", "content": DETECTION_SYSTEM},
+            {"role": "user", "content": message}
+        ],
+        response_format={"type": "json_object"},
+        # gpt-5-mini is a reasoning model: max_completion_tokens covers
+        # reasoning plus output, so the cap must leave room for both or
+        # the JSON envelope gets truncated mid-generation.
+        max_completion_tokens=300
+    )
+
+    raw_output = response.choices[0].message.content.strip()
+
+    # Malformed output raises JSONDecodeError so callers can degrade
+    # without caching the failure as a verdict.
+    return json.loads(raw_output)
+
+# Concurrent requests are gathered for up to 20 ms (or 16 items) and fired
+# together with asyncio.gather, amortizing HTTP/2 framing over the shared
+# connection pool instead of dribbling out one call per request.
+_BATCH_WINDOW = 0.02
+_BATCH_MAX = 16
+_detection_queue: asyncio.Queue = asyncio.Queue()
+
+# Strong references so neither the worker nor an in-flight batch can be
+# garbage-collected mid-execution.
+_worker_task = None
+_batch_tasks = set()
+
+async def _dispatch_batch(batch):
+    results = await asyncio.gather(
+        *(_classify(message) for message, _ in batch),
+        return_exceptions=True,
+    )
+    for (_, fut), result in zip(batch, results):
+        if fut.done():
+            continue
+        if isinstance(result, BaseException):
+            fut.set_exception(result)
+        else:
+            fut.set_result(result)
+
+async def _detection_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _detection_queue.get()]
+        # Fixed deadline from the first item, not a rolling timeout per
+        # arrival, so a trickle of requests cannot hold the batch open
+        # beyond one window.
+        deadline = loop.time() + _BATCH_WINDOW
+        while len(batch) < _BATCH_MAX:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(_detection_queue.get(), timeout=remaining)
+                )
+            except asyncio.TimeoutError:
+                break
+
+        # Fire-and-track: the worker keeps draining the queue while the
+        # batch is in flight, so one slow wave doesn't serialize the rest.
+        task = asyncio.create_task(_dispatch_batch(batch))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+
+async def classify_batched(message: str) -> dict:
+    fut = asyncio.get_running_loop().create_future()
+    await _detection_queue.put((message, fut))
+    return await fut
+
+def start_detection_worker():
+    global _worker_task
+    _worker_task = asyncio.create_task(_detection_worker())
+
+# -------------------------------
+# Verdict Cache
+# -------------------------------
+# Scam messages are heavily templated and re-sent verbatim across
+# conversations; a repeat skips the OpenAI call entirely. Manual LRU
+# (lru_cache cannot wrap the async call site), keyed by message hash.
+_VERDICT_CACHE = OrderedDict()
+_VERDICT_CACHE_MAX = 10_000
+
+def _verdict_key(message: str) -> bytes:
+    return hashlib.blake2b(message.encode(), digest_size=16).digest()
+
+def cache_get_verdict(message: str):
+    key = _verdict_key(message)
+    parsed = _VERDICT_CACHE.get(key)
+    if parsed is not None:
+        _VERDICT_CACHE.move_to_end(key)
+    return parsed
+
+def cache_put_verdict(message: str, parsed: dict):
+    _VERDICT_CACHE[_verdict_key(message)] = parsed
+    if len(_VERDICT_CACHE) > _VERDICT_CACHE_MAX:
+        _VERDICT_CACHE.popitem(last=False)
+
+# -------------------------------
+# Intelligence Extraction Helpers
+# -------------------------------
+def _compile(pattern):
+    """Compile with RE2 (linear time, ReDoS-proof) when available, falling
+    back to the stdlib for patterns RE2 rejects (e.g. lookarounds)."""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+# Compiled once at import; these run on every message. The branches are
+# word-boundary fenced and length-bounded so adversarial pasted text
+# cannot make the engine try a match from every character position.
+# Group names double as intel_type values. The bank pattern stays a
+# separate stdlib pass: its digit lookarounds are the one construct RE2
+# rejects, and folding it into the alternation would force the whole
+# scan back onto the backtracking engine.
+_INTEL_RE = _compile(
+    r"(?P<upi>\b[a-zA-Z0-9.\-_]{2,64}@[a-zA-Z]{2,}\b)"
+    r"|(?P<link>\bhttps?://\S+)"
+)
+_BANK_RE = re.compile(r"(?<!\d)\d{9,18}(?!\d)")
+
+def extract_intelligence(text):
+    buckets = {"upi": set(), "bank": set(), "link": set()}
+    # Cheap guards: plain chit-chat ("ok", "thanks") contains none of the
+    # trigger characters, so the common path skips the regex scans entirely.
+    if "@" in text or "http" in text:
+        for match in _INTEL_RE.finditer(text):
+            buckets[match.lastgroup].add(match.group())
+    if any(ch.isdigit() for ch in text):
+        buckets["bank"].update(_BANK_RE.findall(text))
+    return buckets
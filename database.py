@@ -5,7 +5,11 @@ DATABASE_URL = "sqlite:///./honeypot.db"
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    pool_size=20,
+    max_overflow=40,
+    pool_recycle=3600,
+    pool_pre_ping=True,
 )
 
 SessionLocal = sessionmaker(bind=engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -17,6 +17,9 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_msg_conv", "conversation_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(String, ForeignKey("conversations.conversation_id"), nullable=False)
@@ -34,6 +37,11 @@ class Message(Base):
 
 class Intelligence(Base):
     __tablename__ = "intelligence"
+    __table_args__ = (
+        # The dedup lookup and upsert path in /detect key on this 3-tuple.
+        UniqueConstraint("conversation_id", "intel_type", "value", name="uq_intel_ctv"),
+        Index("ix_intel_ctv", "conversation_id", "intel_type", "value"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(String, ForeignKey("conversations.conversation_id"), nullable=False)